@@ -5,43 +5,95 @@ from typing import Annotated
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db_session
+from app.db.session import get_db_session, get_upload_db_session
 from app.models.user import User
-from app.utils.security import decode_access_token
+from app.utils.auth_cache import (
+    UserAuthSnapshot,
+    cache_user_snapshot,
+    cached_decode_access_token,
+    get_cached_user_snapshot,
+    store_user_snapshot,
+)
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
 
 DatabaseSessionDep = Annotated[AsyncSession, Depends(get_db_session)]
 
+# Relaxed-durability session for the per-chunk upload path only.
+UploadSessionDep = Annotated[AsyncSession, Depends(get_upload_db_session)]
 
-async def get_current_user(
-    db: DatabaseSessionDep,
-    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
-) -> User:
+
+def _user_uuid_from_credentials(credentials: HTTPAuthorizationCredentials | None) -> uuid.UUID:
     if credentials is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     try:
-        payload = decode_access_token(credentials.credentials)
+        payload = cached_decode_access_token(credentials.credentials)
         user_id = payload.get("sub")
         if not user_id:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        user_uuid = uuid.UUID(user_id)
+        return uuid.UUID(user_id)
     except HTTPException:
         raise
     except Exception as exc:  # noqa: BLE001
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token") from exc
 
+
+async def get_current_user(
+    db: DatabaseSessionDep,
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
+) -> User:
+    user_uuid = _user_uuid_from_credentials(credentials)
+
     user = await db.get(User, user_uuid)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    cache_user_snapshot(user)
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Account inactive")
     return user
 
 
+async def get_current_auth(
+    db: DatabaseSessionDep,
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
+) -> UserAuthSnapshot:
+    """Like :func:`get_current_user`, but returns a short-TTL cached snapshot.
+
+    Endpoints that only consult ``id``/``is_admin`` can skip the per-request
+    ``User`` SELECT entirely while the snapshot is fresh; the cache is
+    invalidated whenever a user row is mutated.
+    """
+    user_uuid = _user_uuid_from_credentials(credentials)
+
+    snapshot = get_cached_user_snapshot(user_uuid)
+    if snapshot is None:
+        # Two booleans instead of full row hydration and identity-map work.
+        row = (
+            await db.execute(select(User.is_active, User.is_admin).where(User.id == user_uuid))
+        ).first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        snapshot = store_user_snapshot(
+            UserAuthSnapshot(id=user_uuid, is_active=row[0], is_admin=row[1])
+        )
+    if not snapshot.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Account inactive")
+    return snapshot
+
+
+async def get_current_admin_flags(
+    snapshot: UserAuthSnapshot = Depends(get_current_auth),
+) -> UserAuthSnapshot:
+    """Admin gate for endpoints that only need the caller's id and flags."""
+    if not snapshot.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return snapshot
+
+
 async def get_current_admin(user: User = Depends(get_current_user)) -> User:
     if not user.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
@@ -15,7 +15,7 @@ from app.schemas.auth import (
 )
 from app.schemas.user import RegistrationResponse, UserCreateRequest, UserResponse
 from app.services import users as user_service
-from app.utils.security import create_access_token, verify_password
+from app.utils.security import create_access_token, verify_password_async
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -30,7 +30,7 @@ async def register_user(payload: UserCreateRequest, db: deps.DatabaseSessionDep)
 async def login_for_access_token(payload: TokenRequest, db: deps.DatabaseSessionDep) -> TokenResponse:
     email = payload.username.lower()
     user = await user_service.get_user_by_email(db, email)
-    if not user or not verify_password(payload.password, user.password_hash):
+    if not user or not await verify_password_async(payload.password, user.password_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Account pending activation")
@@ -58,9 +58,9 @@ async def change_password(
 ) -> MessageResponse:
     if len(payload.new_password) < 8:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Password must be at least 8 characters")
-    if not verify_password(payload.current_password, current_user.password_hash):
+    if not await verify_password_async(payload.current_password, current_user.password_hash):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Current password is incorrect")
-    if verify_password(payload.new_password, current_user.password_hash):
+    if await verify_password_async(payload.new_password, current_user.password_hash):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="New password must be different")
 
     await user_service.update_user(db, current_user, password=payload.new_password)
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import uuid
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
+from functools import lru_cache
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from urllib.parse import quote
 
@@ -22,9 +23,11 @@ from app.schemas.file import (
 )
 from app.services import uploads as upload_service
 from app.services import users as user_service
+from app.services import link_cache
+from app.services.counters import download_counters
 from jwt import PyJWTError
 
-from app.utils.security import decode_download_token, get_password_hash, verify_password
+from app.utils.security import decode_download_token, get_password_hash_async, verify_password_async
 
 UNLIMITED_EXPIRY_DELTA = timedelta(days=365 * 100)
 UNLIMITED_FLAG_THRESHOLD = timedelta(days=365 * 50)
@@ -48,12 +51,32 @@ def _assert_file_access(file: StoredFile, user: User) -> None:
 # helper
 
 
+async def _none() -> None:
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _content_disposition(filename: str) -> str:
+    """Build the Content-Disposition header once per filename.
+
+    Filenames are immutable, so the two-pass ASCII conversion plus quote()
+    only needs to run on the first download of a file.
+    """
+    ascii_filename = filename.encode("ascii", "ignore").decode("ascii") or "download"
+    header = f'attachment; filename="{ascii_filename}"'
+    if ascii_filename != filename:
+        header += f"; filename*=UTF-8''{quote(filename)}"
+    return header
+
+
 def _link_to_schema(file: StoredFile, link) -> DownloadLinkDetail:
     reference_created_at = link.created_at or datetime.now(timezone.utc)
     never_expires = False
     if link.expires_at:
         never_expires = (link.expires_at - reference_created_at) >= UNLIMITED_FLAG_THRESHOLD
-    return DownloadLinkDetail(
+    # model_construct skips field validation; everything here comes straight
+    # from our own rows, so coercion would be pure overhead.
+    return DownloadLinkDetail.model_construct(
         id=link.id,
         url=f"/d/{file.id}?token={link.token}",
         expires_at=link.expires_at,
@@ -65,8 +88,8 @@ def _link_to_schema(file: StoredFile, link) -> DownloadLinkDetail:
     )
 
 
-def _file_to_schema(file: StoredFile) -> FileSchema:
-    return FileSchema(
+def _file_to_schema(file: StoredFile, owner_email: str | None) -> FileSchema:
+    return FileSchema.model_construct(
         id=file.id,
         filename=file.filename,
         size=file.size,
@@ -75,7 +98,7 @@ def _file_to_schema(file: StoredFile) -> FileSchema:
         status=file.status.value,
         created_at=file.created_at,
         owner_id=file.owner_id,
-        owner_email=getattr(file.owner, "email", None),
+        owner_email=owner_email,
         links=[_link_to_schema(file, link) for link in file.links],
     )
 
@@ -97,7 +120,7 @@ async def list_files(
         target_owner = current_user
 
     files = await upload_service.list_files(db, owner=target_owner)
-    return FileListResponse(files=[_file_to_schema(file) for file in files])
+    return FileListResponse(files=[_file_to_schema(file, owner_email) for file, owner_email in files])
 
 
 @router.get("/{file_id}", response_model=FileSchema)
@@ -108,7 +131,7 @@ async def get_file_metadata(
 ) -> FileSchema:
     stored_file = await _get_file_or_404(db, file_id)
     _assert_file_access(stored_file, current_user)
-    return _file_to_schema(stored_file)
+    return _file_to_schema(stored_file, stored_file.owner.email if stored_file.owner else None)
 
 
 @router.delete("/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -119,7 +142,8 @@ async def delete_file(
 ) -> Response:
     stored_file = await _get_file_or_404(db, file_id)
     _assert_file_access(stored_file, current_user)
-    owner_user = await user_service.get_user_by_id(db, stored_file.owner_id)
+    # The owner is already joined in by get_file_by_id; no second SELECT.
+    owner_user = stored_file.owner
     if owner_user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Owner not found")
     await upload_service.delete_file(db, stored_file, owner=owner_user)
@@ -132,9 +156,14 @@ async def list_download_links(
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(deps.get_current_user),
 ) -> list[DownloadLinkDetail]:
-    stored_file = await _get_file_or_404(db, file_id)
+    # db.get skips the link selectinload; the listing reads the link columns
+    # as plain rows instead of hydrating ORM objects.
+    stored_file = await db.get(StoredFile, file_id)
+    if stored_file is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
     _assert_file_access(stored_file, current_user)
-    return [_link_to_schema(stored_file, link) for link in stored_file.links]
+    rows = await upload_service.list_link_rows(db, file_id)
+    return [_link_to_schema(stored_file, row) for row in rows]
 
 
 @router.post("/{file_id}/links", response_model=DownloadLinkResponse)
@@ -163,18 +192,17 @@ async def create_download_link(
         minutes = payload.expires_in_minutes or 60
         record_expires_at = now + timedelta(minutes=minutes)
 
-    token, _ = await upload_service.issue_download_token(
-        stored_file,
-        record_expires_at,
-        False,
-    )
-    password_hash = None
-    if payload.password:
-        password_hash = get_password_hash(payload.password).encode()
+    # Short codes no longer need a uniqueness query — the insert relies on
+    # the UNIQUE constraint and retries on collision.
+    short_code = upload_service.generate_short_code() if payload.create_short_link else None
 
-    short_code = None
-    if payload.create_short_link:
-        short_code = await upload_service.generate_unique_short_code(db)
+    # Token signing and bcrypt hashing (executor) are independent; overlap
+    # them instead of paying the sum.
+    (token, _), hashed_password = await asyncio.gather(
+        upload_service.issue_download_token(stored_file, record_expires_at, False),
+        get_password_hash_async(payload.password) if payload.password else _none(),
+    )
+    password_hash = hashed_password.encode() if hashed_password else None
 
     record = await upload_service.create_download_link_record(
         db=db,
@@ -211,11 +239,13 @@ async def delete_download_link(
 ) -> Response:
     stored_file = await _get_file_or_404(db, file_id)
     _assert_file_access(stored_file, current_user)
-    link = next((l for l in stored_file.links if l.id == link_id), None)
+    link = await upload_service.get_link_by_id_and_file(db, file_id, link_id)
     if link is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Link not found")
+    short_code = link.short_code
     await db.delete(link)
     await db.commit()
+    await link_cache.evict(short_code)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -224,7 +254,7 @@ async def download_by_token(
     token: str,
     db: AsyncSession = Depends(get_db_session),
     password: str | None = Query(default=None),
-) -> FileResponse:
+) -> Response:
     try:
         payload = decode_download_token(token)
     except PyJWTError as exc:
@@ -233,9 +263,8 @@ async def download_by_token(
     if not file_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token")
 
-    stored_file = await _get_file_or_404(db, uuid.UUID(file_id))
-    link = next((l for l in stored_file.links if l.token == token), None)
-    if not link:
+    link = await upload_service.get_link_by_token(db, token)
+    if not link or str(link.file_id) != file_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Link not found")
 
     if not link.is_enabled:
@@ -247,37 +276,44 @@ async def download_by_token(
     if link.password_hash:
         if not password:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Password required")
-        if not verify_password(password, link.password_hash.decode()):
+        if not await verify_password_async(password, link.password_hash.decode()):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
 
     download_count = link.download_count or 0
     if link.one_time and download_count >= 1:
         raise HTTPException(status_code=status.HTTP_410_GONE, detail="Link exhausted")
 
-    link.download_count = download_count + 1
     if link.one_time:
+        # Disabling a one-time link is security-critical, so it commits
+        # synchronously; ordinary counts are batched in the background.
+        link.download_count = download_count + 1
         link.is_enabled = False
+        await db.commit()
+    else:
+        await download_counters.increment(link.id)
 
-    await db.commit()
+    # Fetch the file only after the link checks pass; unauthorized or expired
+    # requests never pay for it, and the plain get skips eager loads the
+    # download path does not need.
+    stored_file = await db.get(StoredFile, link.file_id)
+    if stored_file is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
 
-    file_path = Path(stored_file.storage_path)
-    if not file_path.exists():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File missing")
+    # No exists() check here: nginx 404s on a missing file when it resolves
+    # the X-Accel-Redirect, and the stat() was a blocking syscall per download.
 
-    ascii_filename = stored_file.filename.encode('ascii', 'ignore').decode('ascii') or 'download'
-    content_disposition = f"attachment; filename=\"{ascii_filename}\""
-    if ascii_filename != stored_file.filename:
-        content_disposition += f"; filename*=UTF-8''{quote(stored_file.filename)}"
+    content_disposition = _content_disposition(stored_file.filename)
 
     headers = {
         "X-Accel-Redirect": f"/_protected/{stored_file.id}/data",
         "Content-Disposition": content_disposition,
     }
-    return FileResponse(
-        path=file_path,
-        media_type=stored_file.mime_type or "application/octet-stream",
-        filename=stored_file.filename,
+    # nginx serves the bytes via X-Accel-Redirect; a FileResponse here would
+    # stat/open the file and set up a streamer whose body is never consumed.
+    return Response(
+        status_code=status.HTTP_200_OK,
         headers=headers,
+        media_type=stored_file.mime_type or "application/octet-stream",
     )
 
 
@@ -286,20 +322,30 @@ async def download_by_short_code(
     short_code: str,
     db: AsyncSession = Depends(get_db_session),
     password: str | None = Query(default=None),
-) -> FileResponse:
-    link = await upload_service.get_link_by_short_code(db, short_code)
-    if not link:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Link not found")
-    if link.require_download_page or link.password_hash:
-        stored_file = await upload_service.get_file_by_id(db, link.file_id)
+) -> Response:
+    resolution = await link_cache.get(short_code)
+    if resolution is None:
+        link = await upload_service.get_link_by_short_code(db, short_code)
+        if not link:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Link not found")
+        resolution = link_cache.ShortLinkResolution(
+            token=link.token,
+            file_id=link.file_id,
+            require_download_page=link.require_download_page,
+            has_password=bool(link.password_hash),
+        )
+        await link_cache.put(short_code, resolution, link.expires_at)
+
+    if resolution.require_download_page or resolution.has_password:
+        stored_file = await upload_service.get_file_by_id(db, resolution.file_id)
         if not stored_file:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
-        target = f"/share-download/{stored_file.id}?token={link.token}"
+        target = f"/share-download/{stored_file.id}?token={resolution.token}"
         if stored_file.filename:
             target += f"&name={quote(stored_file.filename)}"
         return RedirectResponse(url=target, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
 
-    return await download_by_token(token=link.token, db=db, password=password)
+    return await download_by_token(token=resolution.token, db=db, password=password)
 
 
 @public_router.get("/d/{file_id}")
@@ -308,5 +354,5 @@ async def download_with_query(
     db: AsyncSession = Depends(get_db_session),
     token: str = Query(...),
     password: str | None = Query(default=None),
-) -> FileResponse:
+) -> Response:
     return await download_by_token(token=token, password=password, db=db)
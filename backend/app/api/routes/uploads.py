@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import hashlib
 import uuid
 from typing import Any
 
@@ -10,6 +9,7 @@ from app.api import deps
 from app.core.config import settings
 from app.models.user import User
 from app.models.upload import UploadStatus
+from app.utils.auth_cache import UserAuthSnapshot
 from app.schemas.upload import (
     CreateSessionRequest,
     CreateSessionResponse,
@@ -18,12 +18,25 @@ from app.schemas.upload import (
     SessionStatusResponse,
 )
 from app.services import uploads as upload_service
-from app.services.storage import storage_service
+from app.services.storage import ChunkTooLargeError, storage_service
 from app.worker import finalize_upload_task
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
 
+def _missing_indexes(received: list[int], total_chunks: int) -> list[int]:
+    """Derive missing chunk indexes from a flat byte mask.
+
+    Avoids building a Python set (and a hash probe per index) for sessions
+    with tens of thousands of chunks; the mask costs one byte per chunk and
+    the scan is a tight loop over a bytearray.
+    """
+    mask = bytearray(total_chunks)
+    for index in received:
+        mask[index] = 1
+    return [index for index, seen in enumerate(mask) if not seen]
+
+
 @router.post("/sessions", response_model=CreateSessionResponse)
 async def create_session(
     payload: CreateSessionRequest,
@@ -45,15 +58,15 @@ async def create_session(
 async def get_session_status(
     session_id: uuid.UUID,
     db: deps.DatabaseSessionDep,
-    current_user: User = Depends(deps.get_current_user),
+    current_user: UserAuthSnapshot = Depends(deps.get_current_auth),
 ) -> SessionStatusResponse:
     session = await upload_service.get_upload_session(db, session_id)
     if session.owner_id != current_user.id and not current_user.is_admin:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found")
     received = await upload_service.session_received_indexes(db, session)
-    received_set = set(received)
-    missing = [idx for idx in range(session.total_chunks) if idx not in received_set]
-    return SessionStatusResponse(received=sorted(received), missing=missing, status=session.status)
+    missing = _missing_indexes(received, session.total_chunks)
+    # received arrives pre-sorted from the aggregate.
+    return SessionStatusResponse(received=received, missing=missing, status=session.status)
 
 
 @router.put("/sessions/{session_id}/chunk/{index}")
@@ -61,10 +74,12 @@ async def upload_chunk(
     session_id: uuid.UUID,
     index: int,
     request: Request,
-    db: deps.DatabaseSessionDep,
-    current_user: User = Depends(deps.get_current_user),
+    db: deps.UploadSessionDep,
+    current_user: UserAuthSnapshot = Depends(deps.get_current_auth),
 ) -> dict[str, Any]:
-    session = await upload_service.get_upload_session(db, session_id)
+    # Column-only cached lookup: the session row is immutable while chunks
+    # stream in, so the per-chunk SELECT is skipped within the cache TTL.
+    session = await upload_service.get_upload_session_info(db, session_id)
     if session.owner_id != current_user.id and not current_user.is_admin:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found")
 
@@ -73,25 +88,38 @@ async def upload_chunk(
     if index < 0 or index >= session.total_chunks:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid chunk index")
 
-    raw_data = await request.body()
-    actual_size = len(raw_data)
-
-    expected_size = request.headers.get("X-Chunk-Size")
-    if expected_size is not None and actual_size != int(expected_size):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Chunk size mismatch")
-
-    if actual_size == 0:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty chunk")
-    if actual_size > settings.max_chunk_size:
-        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Chunk too large")
-
-    checksum_header = request.headers.get("X-Chunk-Checksum")
-    computed_checksum = hashlib.sha256(raw_data).hexdigest()
-    if checksum_header and checksum_header.lower() != computed_checksum.lower():
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Checksum mismatch")
-
-    stored_path = await storage_service.write_chunk(str(session.id), index, raw_data)
-    await upload_service.record_chunk(db, session, index, computed_checksum, actual_size, str(stored_path))
+    try:
+        tmp_path, actual_size, computed_checksum = await storage_service.write_chunk_stream(
+            str(session.id),
+            index,
+            request.stream(),
+            max_bytes=settings.max_chunk_size,
+        )
+    except ChunkTooLargeError as exc:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Chunk too large") from exc
+
+    # Validation and bookkeeping run against the temp file; only a chunk
+    # that passed every check is renamed onto the final path, so a bad
+    # re-upload can never clobber a previously accepted chunk.
+    try:
+        expected_size = request.headers.get("X-Chunk-Size")
+        if expected_size is not None and actual_size != int(expected_size):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Chunk size mismatch")
+
+        if actual_size == 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty chunk")
+
+        checksum_header = request.headers.get("X-Chunk-Checksum")
+        if checksum_header and checksum_header.lower() != computed_checksum.lower():
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Checksum mismatch")
+
+        stored_path = storage_service.chunk_path(str(session.id), index)
+        await upload_service.record_chunk(db, session, index, computed_checksum, actual_size, str(stored_path))
+    except BaseException:
+        await storage_service.discard_chunk(tmp_path)
+        raise
+
+    await storage_service.promote_chunk(str(session.id), index, tmp_path)
 
     return {"received": index, "size": actual_size}
 
@@ -101,7 +129,7 @@ async def finalize_session(
     session_id: uuid.UUID,
     payload: FinalizeRequest,
     db: deps.DatabaseSessionDep,
-    current_user: User = Depends(deps.get_current_user),
+    current_user: UserAuthSnapshot = Depends(deps.get_current_auth),
 ) -> FinalizeResponse:
     session = await upload_service.get_upload_session(db, session_id)
     if session.owner_id != current_user.id and not current_user.is_admin:
@@ -114,13 +142,14 @@ async def finalize_session(
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="File hash mismatch")
 
     received = await upload_service.session_received_indexes(db, session)
-    missing = [idx for idx in range(session.total_chunks) if idx not in set(received)]
-    if missing:
+    # Indexes are unique (DB constraint) and range-checked on upload, so a
+    # count comparison is enough — no need to materialize the missing list.
+    if len(received) != session.total_chunks:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Incomplete upload")
 
     await upload_service.mark_session_finalizing(db, session)
     stored_file = await upload_service.create_file_record(db, session)
 
-    finalize_upload_task.delay(str(session.id), str(stored_file.id))
+    finalize_upload_task.delay(session.id, stored_file.id)
 
     return FinalizeResponse(upload_session_id=session.id, file_id=stored_file.id, status=session.status)
@@ -3,9 +3,10 @@ from __future__ import annotations
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, Response, status
+from pydantic import TypeAdapter
 
 from app.api import deps
-from app.models.user import User
+from app.utils.auth_cache import UserAuthSnapshot
 from app.schemas.user import (
     UserAdminCreateRequest,
     UserListResponse,
@@ -16,21 +17,25 @@ from app.services import users as user_service
 
 router = APIRouter(prefix="/admin/users", tags=["admin:users"])
 
+# One pydantic-core pass over the whole result set beats instantiating each
+# model in a Python loop.
+_user_list_adapter = TypeAdapter(list[UserResponse])
+
 
 @router.get("/", response_model=UserListResponse)
 async def list_users(
     db: deps.DatabaseSessionDep,
-    _: User = Depends(deps.get_current_admin),
+    _: UserAuthSnapshot = Depends(deps.get_current_admin_flags),
 ) -> UserListResponse:
     users = await user_service.list_users(db)
-    return UserListResponse(users=[UserResponse.model_validate(user) for user in users])
+    return UserListResponse(users=_user_list_adapter.validate_python(users, from_attributes=True))
 
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(
     payload: UserAdminCreateRequest,
     db: deps.DatabaseSessionDep,
-    _: User = Depends(deps.get_current_admin),
+    _: UserAuthSnapshot = Depends(deps.get_current_admin_flags),
 ) -> UserResponse:
     user = await user_service.create_user(
         db,
@@ -48,7 +53,7 @@ async def update_user(
     user_id: uuid.UUID,
     payload: UserUpdateRequest,
     db: deps.DatabaseSessionDep,
-    current_admin: User = Depends(deps.get_current_admin),
+    current_admin: UserAuthSnapshot = Depends(deps.get_current_admin_flags),
 ) -> UserResponse:
     user = await user_service.get_user_by_id(db, user_id)
     if user is None:
@@ -76,7 +81,7 @@ async def update_user(
 async def delete_user(
     user_id: uuid.UUID,
     db: deps.DatabaseSessionDep,
-    current_admin: User = Depends(deps.get_current_admin),
+    current_admin: UserAuthSnapshot = Depends(deps.get_current_admin_flags),
 ) -> Response:
     user = await user_service.get_user_by_id(db, user_id)
     if user is None:
@@ -18,6 +18,11 @@ class Settings(BaseSettings):
     )
     redis_url: str = Field(default="redis://redis:6379/0", description="Redis connection URL")
 
+    db_pool_size: int = Field(default=20, ge=1)
+    db_max_overflow: int = Field(default=40, ge=0)
+    db_pool_recycle_seconds: int = Field(default=1800, ge=0)
+    db_prepared_statement_cache_size: int = Field(default=256, ge=0)
+
     storage_root: Path = Field(
         default=Path(__file__).resolve().parents[3] / "Storage",
         description="Base directory for file storage",
@@ -25,6 +30,11 @@ class Settings(BaseSettings):
     tmp_dir_name: str = Field(default="uploads/tmp")
     files_dir_name: str = Field(default="files")
 
+    storage_use_odirect: bool = Field(
+        default=False,
+        description="Write chunk files with O_DIRECT to bypass the page cache (Linux only)",
+    )
+
     max_chunk_size: int = Field(default=16 * 1024 * 1024, ge=1)
     default_chunk_size: int = Field(default=8 * 1024 * 1024, ge=1)
 
@@ -54,19 +64,21 @@ class Settings(BaseSettings):
     def _build_storage_root(cls, value: Path | str) -> Path:
         return Path(value)
 
-    @property
+    # cached_property: these are read on every chunk write and download
+    # resolution, and a plain property would rebuild the Path each access.
+    @cached_property
     def tmp_dir(self) -> Path:
         return self.storage_root / self.tmp_dir_name
 
-    @property
+    @cached_property
     def files_dir(self) -> Path:
         return self.storage_root / self.files_dir_name
 
-    @property
+    @cached_property
     def celery_broker(self) -> str:
         return self.celery_broker_url or self.redis_url
 
-    @property
+    @cached_property
     def celery_backend(self) -> str:
         return self.celery_result_backend or self.redis_url
 
@@ -4,11 +4,55 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_asyn
 
 from app.core.config import settings
 
-engine = create_async_engine(settings.database_url, future=True, echo=False, pool_pre_ping=True)
+engine = create_async_engine(
+    settings.database_url,
+    future=True,
+    echo=False,
+    pool_pre_ping=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle_seconds,
+    pool_use_lifo=True,
+    connect_args={"prepared_statement_cache_size": settings.db_prepared_statement_cache_size},
+)
 
 async_session_factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+# Separate engine for the per-chunk write path with synchronous_commit off:
+# the commit returns without waiting for the WAL flush, amortizing fsyncs
+# across chunks. Chunk rows are recoverable (the client re-sends on probe),
+# so losing the last few on a crash is acceptable; everything else stays on
+# the fully durable default engine.
+upload_engine = create_async_engine(
+    settings.database_url,
+    future=True,
+    echo=False,
+    pool_pre_ping=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle_seconds,
+    pool_use_lifo=True,
+    connect_args={
+        "prepared_statement_cache_size": settings.db_prepared_statement_cache_size,
+        "server_settings": {"synchronous_commit": "off"},
+    },
+)
+
+upload_session_factory = async_sessionmaker(upload_engine, expire_on_commit=False, class_=AsyncSession)
+
+
+async def warm_up_db_pool() -> None:
+    """Open and release ``pool_size`` connections so early requests skip connect cost."""
+    connections = [await engine.connect() for _ in range(settings.db_pool_size)]
+    for connection in connections:
+        await connection.close()
+
 
 async def get_db_session() -> AsyncSession:
     async with async_session_factory() as session:
         yield session
+
+
+async def get_upload_db_session() -> AsyncSession:
+    async with upload_session_factory() as session:
+        yield session
@@ -9,7 +9,8 @@ from app.api.router import api_router
 from app.api.routes.files import public_router as download_router
 from app.core.config import settings
 from app.db.base import Base
-from app.db.session import async_session_factory, engine
+from app.db.session import async_session_factory, engine, warm_up_db_pool
+from app.services.counters import download_counters
 from app.services.storage import storage_service
 from app.services.users import ensure_admin_user
 
@@ -38,8 +39,14 @@ def create_application() -> FastAPI:
                 email=settings.admin_email,
                 password_hash=settings.effective_admin_password_hash,
             )
+        await warm_up_db_pool()
+        download_counters.start()
         logger.info("Storage directories ensured under %s", settings.storage_root)
 
+    @app.on_event("shutdown")
+    async def shutdown_event() -> None:  # noqa: D401
+        await download_counters.stop()
+
     app.include_router(api_router, prefix=settings.api_prefix)
     app.include_router(download_router)
 
@@ -7,12 +7,14 @@ from datetime import datetime, timedelta, timezone
 from typing import TYPE_CHECKING
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     CheckConstraint,
     Column,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     LargeBinary,
     String,
@@ -48,7 +50,7 @@ class UploadSession(Base):
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     filename: Mapped[str] = mapped_column(String(512), nullable=False)
-    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
     mime_type: Mapped[str | None] = mapped_column(String(255), nullable=True)
     chunk_size: Mapped[int] = mapped_column(Integer, nullable=False)
     total_chunks: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -71,8 +73,16 @@ class UploadSession(Base):
     file: Mapped[StoredFile | None] = relationship(
         "StoredFile", back_populates="session", uselist=False, cascade="all, delete-orphan"
     )
+    # lazy="raise": chunk bookkeeping goes through aggregate queries
+    # (session_received_indexes, the worker's COUNT/MAX/SUM) — hydrating the
+    # whole collection alongside every session load would undo them. The FK
+    # cascades at the DB level, so deletes never need the rows either.
     chunks: Mapped[list[UploadChunk]] = relationship(
-        "UploadChunk", back_populates="session", cascade="all, delete-orphan", lazy="selectin"
+        "UploadChunk",
+        back_populates="session",
+        cascade="all, delete-orphan",
+        lazy="raise",
+        passive_deletes=True,
     )
 
     @staticmethod
@@ -94,13 +104,15 @@ class UploadChunk(Base):
     )
     index: Mapped[int] = mapped_column(Integer, nullable=False)
     checksum: Mapped[str] = mapped_column(String(128), nullable=False)
-    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
     received_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc)
     )
     stored_path: Mapped[str] = mapped_column(String(1024), nullable=False)
 
-    session: Mapped[UploadSession] = relationship("UploadSession", back_populates="chunks")
+    # lazy="raise": nothing should walk from a chunk back to its session via
+    # the ORM; an accidental access fails loudly instead of emitting a SELECT.
+    session: Mapped[UploadSession] = relationship("UploadSession", back_populates="chunks", lazy="raise")
 
 
 class StoredFile(Base):
@@ -111,7 +123,7 @@ class StoredFile(Base):
         UUID(as_uuid=True), ForeignKey("upload_sessions.id", ondelete="SET NULL"), nullable=True
     )
     filename: Mapped[str] = mapped_column(String(512), nullable=False)
-    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
     mime_type: Mapped[str | None] = mapped_column(String(255))
     sha256: Mapped[str] = mapped_column(String(128), nullable=False)
     owner_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -121,12 +133,19 @@ class StoredFile(Base):
     completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
 
     owner: Mapped["User"] = relationship("User", back_populates="files")
-    session: Mapped[UploadSession | None] = relationship("UploadSession", back_populates="file")
+    # No endpoint walks from a stored file back to its upload session; raising
+    # keeps the listing queries honest about what they load.
+    session: Mapped[UploadSession | None] = relationship("UploadSession", back_populates="file", lazy="raise")
     links: Mapped[list[DownloadLink]] = relationship(
         "DownloadLink", back_populates="file", cascade="all, delete-orphan"
     )
 
 
+# list_files filters by owner and orders by created_at DESC; this composite
+# index lets PostgreSQL walk it in output order instead of seq-scan + sort.
+Index("ix_stored_files_owner_created", StoredFile.owner_id, StoredFile.created_at.desc())
+
+
 class DownloadLink(Base):
     __tablename__ = "download_links"
 
@@ -144,4 +163,6 @@ class DownloadLink(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     short_code: Mapped[str | None] = mapped_column(String(32), unique=True)
 
-    file: Mapped[StoredFile] = relationship("StoredFile", back_populates="links")
+    # Same rationale as UploadChunk.session: links are always reached from
+    # their file, never the other way round.
+    file: Mapped[StoredFile] = relationship("StoredFile", back_populates="links", lazy="raise")
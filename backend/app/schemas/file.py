@@ -3,7 +3,7 @@ from __future__ import annotations
 import uuid
 from datetime import datetime
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class DownloadLinkDetail(BaseModel):
@@ -16,8 +16,7 @@ class DownloadLinkDetail(BaseModel):
     has_password: bool
     short_url: str | None = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class FileResponse(BaseModel):
@@ -32,8 +31,7 @@ class FileResponse(BaseModel):
     owner_email: str | None = None
     links: list[DownloadLinkDetail] = []
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class CreateLinkRequest(BaseModel):
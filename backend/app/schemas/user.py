@@ -1,16 +1,33 @@
 from __future__ import annotations
 
+import re
 import uuid
 from datetime import datetime
+from typing import Annotated
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, BeforeValidator, ConfigDict, EmailStr, Field
+
+# Response models only echo addresses that were fully validated at
+# registration time, so a single linear-scan regex is enough there; the
+# heavyweight email_validator (EmailStr) stays on the create path.
+_EMAIL_SHAPE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+def _check_email_shape(value: object) -> object:
+    if isinstance(value, str) and not _EMAIL_SHAPE.match(value):
+        raise ValueError("value is not a valid email address")
+    return value
+
+
+EmailAddress = Annotated[str, BeforeValidator(_check_email_shape)]
 
 
 class UserBase(BaseModel):
-    email: EmailStr
+    email: EmailAddress
 
 
 class UserCreateRequest(UserBase):
+    email: EmailStr
     password: str = Field(min_length=8)
 
 
@@ -35,8 +52,7 @@ class UserResponse(UserBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class UserListResponse(BaseModel):
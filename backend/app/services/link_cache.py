@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import orjson
+from redis import asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "sc:"
+
+_redis: aioredis.Redis | None = None
+
+
+def _client() -> aioredis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(settings.redis_url)
+    return _redis
+
+
+@dataclass(frozen=True)
+class ShortLinkResolution:
+    """The minimal link fields the short-code route needs to route a request."""
+
+    token: str
+    file_id: uuid.UUID
+    require_download_page: bool
+    has_password: bool
+
+
+async def get(short_code: str) -> ShortLinkResolution | None:
+    try:
+        raw = await _client().get(_KEY_PREFIX + short_code)
+    except Exception:  # noqa: BLE001 - the cache is best-effort
+        logger.debug("Short-link cache read failed for %s", short_code, exc_info=True)
+        return None
+    if raw is None:
+        return None
+    data = orjson.loads(raw)
+    return ShortLinkResolution(
+        token=data["token"],
+        file_id=uuid.UUID(data["file_id"]),
+        require_download_page=data["require_download_page"],
+        has_password=data["has_password"],
+    )
+
+
+async def put(short_code: str, resolution: ShortLinkResolution, expires_at: datetime) -> None:
+    """Cache a resolution until the link itself expires; short codes are immutable."""
+    if expires_at <= datetime.now(timezone.utc):
+        return
+    payload = orjson.dumps(
+        {
+            "token": resolution.token,
+            "file_id": str(resolution.file_id),
+            "require_download_page": resolution.require_download_page,
+            "has_password": resolution.has_password,
+        }
+    )
+    try:
+        await _client().set(_KEY_PREFIX + short_code, payload, exat=int(expires_at.timestamp()))
+    except Exception:  # noqa: BLE001
+        logger.debug("Short-link cache write failed for %s", short_code, exc_info=True)
+
+
+async def evict(short_code: str | None) -> None:
+    if not short_code:
+        return
+    try:
+        await _client().delete(_KEY_PREFIX + short_code)
+    except Exception:  # noqa: BLE001
+        logger.debug("Short-link cache eviction failed for %s", short_code, exc_info=True)
@@ -1,21 +1,25 @@
 from __future__ import annotations
 
+import time
 import uuid
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 import secrets
 import string
 from pathlib import Path
 
 from fastapi import HTTPException, status
-from sqlalchemy import delete, select
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, raiseload, selectinload
 
 from app.core.config import settings
 from app.models.upload import DownloadLink, FileStatus, StoredFile, UploadChunk, UploadSession, UploadStatus
 from app.models.user import User
 from app.schemas.upload import CreateSessionRequest
+from app.services import link_cache
 from app.services.storage import storage_service
 from app.services.users import increment_used_bytes
 from app.utils.security import create_download_token
@@ -29,7 +33,11 @@ async def create_upload_session(db: AsyncSession, payload: CreateSessionRequest,
 
     storage_service.ensure_base_dirs()
 
+    # Generating the id client-side lets the path be derived before the
+    # INSERT, so the row lands in one commit with no flush/refresh.
+    session_id = uuid.uuid4()
     session = UploadSession(
+        id=session_id,
         owner_id=owner.id,
         filename=payload.filename,
         size=payload.size,
@@ -39,14 +47,11 @@ async def create_upload_session(db: AsyncSession, payload: CreateSessionRequest,
         file_sha256=payload.file_sha256,
         status=UploadStatus.UPLOADING,
         expires_at=UploadSession.build_expiration(),
-        upload_path="",
+        upload_path=str(storage_service.session_tmp_dir(str(session_id))),
     )
 
     db.add(session)
-    await db.flush()
-    session.upload_path = str(storage_service.session_tmp_dir(str(session.id)))
     await db.commit()
-    await db.refresh(session)
     return session
 
 
@@ -58,69 +63,128 @@ async def get_upload_session(db: AsyncSession, session_id: uuid.UUID) -> UploadS
     return session
 
 
+@dataclass(frozen=True)
+class UploadSessionInfo:
+    """The session fields the per-chunk hot path actually checks."""
+
+    id: uuid.UUID
+    owner_id: uuid.UUID
+    status: UploadStatus
+    total_chunks: int
+
+
+_SESSION_INFO_TTL = 10.0
+
+# session id -> (info, monotonic expiry); a chunk upload of N parts otherwise
+# re-SELECTs the same immutable session row N times.
+_session_info_cache: dict[uuid.UUID, tuple[UploadSessionInfo, float]] = {}
+
+
+def evict_upload_session_info(session_id: uuid.UUID) -> None:
+    _session_info_cache.pop(session_id, None)
+
+
+async def get_upload_session_info(db: AsyncSession, session_id: uuid.UUID) -> UploadSessionInfo:
+    """Column-only, short-TTL cached variant of :func:`get_upload_session`.
+
+    owner_id and total_chunks never change after creation; status is evicted
+    locally on finalize and bounded by the TTL elsewhere, and a stale
+    UPLOADING entry is harmless because late chunk inserts are idempotent.
+    """
+    entry = _session_info_cache.get(session_id)
+    if entry is not None:
+        info, expires_at = entry
+        if time.monotonic() < expires_at:
+            return info
+        _session_info_cache.pop(session_id, None)
+
+    stmt = select(
+        UploadSession.owner_id, UploadSession.status, UploadSession.total_chunks
+    ).where(UploadSession.id == session_id)
+    row = (await db.execute(stmt)).first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found")
+    info = UploadSessionInfo(id=session_id, owner_id=row[0], status=row[1], total_chunks=row[2])
+    _session_info_cache[session_id] = (info, time.monotonic() + _SESSION_INFO_TTL)
+    return info
+
+
 async def record_chunk(
     db: AsyncSession,
-    session: UploadSession,
+    session: UploadSession | UploadSessionInfo,
     index: int,
     checksum: str,
     size: int,
     stored_path: str,
 ) -> UploadChunk:
-    existing_stmt = select(UploadChunk).where(
-        UploadChunk.session_id == session.id, UploadChunk.index == index
+    """Record a received chunk with a single INSERT ... ON CONFLICT DO NOTHING.
+
+    The happy path is one round-trip; the extra SELECT only runs for
+    duplicate retries, where the stored checksum must match the resent one.
+    """
+    values = {
+        "session_id": session.id,
+        "index": index,
+        "checksum": checksum,
+        "size": size,
+        "stored_path": stored_path,
+    }
+    stmt = pg_insert(UploadChunk).values(**values).on_conflict_do_nothing(
+        index_elements=["session_id", "index"]
     )
-    existing_chunk = (await db.execute(existing_stmt)).scalar_one_or_none()
+    result = await db.execute(stmt)
+    await db.commit()
 
-    if existing_chunk:
-        if existing_chunk.checksum != checksum:
+    if result.rowcount == 0:
+        existing_stmt = select(UploadChunk).where(
+            UploadChunk.session_id == session.id, UploadChunk.index == index
+        )
+        existing_chunk = (await db.execute(existing_stmt)).scalar_one_or_none()
+        if existing_chunk is None or existing_chunk.checksum != checksum:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Checksum mismatch on duplicate chunk")
         return existing_chunk
 
-    chunk = UploadChunk(
-        session_id=session.id,
-        index=index,
-        checksum=checksum,
-        size=size,
-        stored_path=stored_path,
-    )
-    db.add(chunk)
-    try:
-        await db.commit()
-    except IntegrityError as exc:  # race condition safe-guard
-        await db.rollback()
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Chunk already recorded") from exc
-    await db.refresh(chunk)
-    return chunk
+    # The caller only reads back fields it already supplied; skip the refresh.
+    return UploadChunk(**values)
 
 
 async def session_received_indexes(db: AsyncSession, session: UploadSession) -> list[int]:
-    stmt = select(UploadChunk.index).where(UploadChunk.session_id == session.id)
-    result = await db.execute(stmt)
-    return [row[0] for row in result.all()]
+    # array_agg collapses the result to a single row: one int array crosses
+    # the wire instead of one row per chunk, so no server-side cursor or
+    # yield_per batching is needed. Ordering inside the aggregate walks the
+    # (session_id, index) btree, sparing the Python sort on the route.
+    stmt = select(
+        func.array_agg(aggregate_order_by(UploadChunk.index, UploadChunk.index))
+    ).where(UploadChunk.session_id == session.id)
+    indexes = (await db.execute(stmt)).scalar_one()
+    return indexes or []
 
 
 async def mark_session_finalizing(db: AsyncSession, session: UploadSession) -> None:
     session.status = UploadStatus.FINALIZING
     session.updated_at = datetime.now(timezone.utc)
     await db.commit()
+    evict_upload_session_info(session.id)
+    # The tmp dir is about to be consumed (and removed) by the worker; drop
+    # the API-side dir-cache entry so it cannot serve a deleted path later.
+    storage_service.evict_session_dir(str(session.id))
 
 
 async def create_file_record(db: AsyncSession, session: UploadSession) -> StoredFile:
+    file_id = uuid.uuid4()
     stored_file = StoredFile(
+        id=file_id,
         session_id=session.id,
         owner_id=session.owner_id,
         filename=session.filename,
         size=session.size,
         mime_type=session.mime_type,
         sha256=session.file_sha256,
-        storage_path="",
+        storage_path=str(storage_service.final_file_path(str(file_id))),
         status=FileStatus.PENDING,
     )
     db.add(stored_file)
-    await db.flush()
-    stored_file.storage_path = str(storage_service.final_file_path(str(stored_file.id)))
     await db.commit()
-    await db.refresh(stored_file)
     return stored_file
 
 
@@ -148,21 +212,37 @@ async def create_download_link_record(
     require_download_page: bool,
     short_code: str | None,
 ) -> DownloadLink:
-    record = DownloadLink(
-        file_id=file.id,
-        token=token,
-        expires_at=expires_at,
-        one_time=one_time,
-        download_count=0,
-        password_hash=password_hash,
-        is_enabled=True,
-        require_download_page=require_download_page,
-        short_code=short_code,
+    """Insert a download link, relying on the UNIQUE constraint for short codes.
+
+    Short-code collisions (~1e-11 for 8 chars over base62) are handled by
+    retrying the insert with a fresh code instead of pre-checking with a
+    SELECT on every creation.
+    """
+    for _ in range(3):
+        record = DownloadLink(
+            file_id=file.id,
+            token=token,
+            expires_at=expires_at,
+            one_time=one_time,
+            download_count=0,
+            password_hash=password_hash,
+            is_enabled=True,
+            require_download_page=require_download_page,
+            short_code=short_code,
+        )
+        db.add(record)
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            if short_code is None:
+                raise
+            short_code = generate_short_code()
+            continue
+        return record
+    raise HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not allocate short code"
     )
-    db.add(record)
-    await db.commit()
-    await db.refresh(record)
-    return record
 
 
 async def issue_download_token(
@@ -174,19 +254,15 @@ async def issue_download_token(
     return token, expires_at
 
 
-async def generate_unique_short_code(db: AsyncSession, length: int = 8) -> str:
+def generate_short_code(length: int = 8) -> str:
     alphabet = string.ascii_letters + string.digits
-    while True:
-        candidate = ''.join(secrets.choice(alphabet) for _ in range(length))
-        result = await db.execute(select(DownloadLink).where(DownloadLink.short_code == candidate))
-        if result.scalar_one_or_none() is None:
-            return candidate
+    return ''.join(secrets.choice(alphabet) for _ in range(length))
 
 
 async def get_file_by_id(db: AsyncSession, file_id: uuid.UUID) -> StoredFile | None:
     stmt = (
         select(StoredFile)
-        .options(selectinload(StoredFile.links), selectinload(StoredFile.owner))
+        .options(selectinload(StoredFile.links), joinedload(StoredFile.owner), raiseload("*"))
         .where(StoredFile.id == file_id)
     )
     result = await db.execute(stmt)
@@ -197,15 +273,28 @@ async def list_files(
     db: AsyncSession,
     *,
     owner: User | None = None,
-) -> list[StoredFile]:
-    stmt = select(StoredFile).options(selectinload(StoredFile.links), selectinload(StoredFile.owner)).order_by(StoredFile.created_at.desc())
+) -> list[tuple[StoredFile, str | None]]:
+    """Return files with their owner's email as a scalar column.
+
+    Joining the email in directly avoids hydrating a full User row per file
+    when the listing only needs the address.
+    """
+    stmt = (
+        select(StoredFile, User.email)
+        .join(User, StoredFile.owner_id == User.id)
+        # raiseload turns any relationship we forgot to load eagerly into an
+        # immediate error instead of a silent per-row SELECT.
+        .options(selectinload(StoredFile.links), raiseload("*"))
+        .order_by(StoredFile.created_at.desc())
+    )
     if owner is not None:
         stmt = stmt.where(StoredFile.owner_id == owner.id)
     result = await db.execute(stmt)
-    return list(result.scalars())
+    return [(file, email) for file, email in result.all()]
 
 
 async def delete_file(db: AsyncSession, file: StoredFile, *, owner: User) -> None:
+    short_codes = [link.short_code for link in file.links if link.short_code]
     path = Path(file.storage_path)
     try:
         if path.exists():
@@ -222,9 +311,45 @@ async def delete_file(db: AsyncSession, file: StoredFile, *, owner: User) -> Non
     await db.delete(file)
     await db.commit()
 
+    for short_code in short_codes:
+        await link_cache.evict(short_code)
+
     await increment_used_bytes(db, owner, -file.size)
 
 
 async def get_link_by_short_code(db: AsyncSession, short_code: str) -> DownloadLink | None:
     result = await db.execute(select(DownloadLink).where(DownloadLink.short_code == short_code))
     return result.scalar_one_or_none()
+
+
+async def list_link_rows(db: AsyncSession, file_id: uuid.UUID) -> list:
+    """Return link columns as plain rows for read-only listing.
+
+    Skips ORM hydration and identity-map bookkeeping entirely; the rows
+    expose the same attribute names as DownloadLink, so schema-building
+    helpers can consume either.
+    """
+    stmt = select(
+        DownloadLink.id,
+        DownloadLink.token,
+        DownloadLink.expires_at,
+        DownloadLink.download_count,
+        DownloadLink.require_download_page,
+        DownloadLink.password_hash,
+        DownloadLink.short_code,
+        DownloadLink.created_at,
+    ).where(DownloadLink.file_id == file_id)
+    result = await db.execute(stmt)
+    return result.all()
+
+
+async def get_link_by_token(db: AsyncSession, token: str) -> DownloadLink | None:
+    result = await db.execute(select(DownloadLink).where(DownloadLink.token == token))
+    return result.scalar_one_or_none()
+
+
+async def get_link_by_id_and_file(db: AsyncSession, file_id: uuid.UUID, link_id: uuid.UUID) -> DownloadLink | None:
+    result = await db.execute(
+        select(DownloadLink).where(DownloadLink.id == link_id, DownloadLink.file_id == file_id)
+    )
+    return result.scalar_one_or_none()
@@ -4,12 +4,14 @@ import uuid
 from typing import Iterable
 
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.models.user import User
-from app.utils.security import get_password_hash
+from app.utils.auth_cache import invalidate_user_snapshot
+from app.utils.security import get_password_hash_async
 
 
 async def create_user(
@@ -23,7 +25,7 @@ async def create_user(
 ) -> User:
     user = User(
         email=email.lower(),
-        password_hash=get_password_hash(password),
+        password_hash=await get_password_hash_async(password),
         is_admin=is_admin,
         is_active=is_active if is_active is not None else is_admin,
         quota_bytes=quota_bytes,
@@ -95,24 +97,44 @@ async def update_user(
     if quota_bytes is not _SENTINEL:
         user.quota_bytes = quota_bytes  # type: ignore[assignment]
     if password:
-        user.password_hash = get_password_hash(password)
+        user.password_hash = await get_password_hash_async(password)
     await db.commit()
     await db.refresh(user)
+    invalidate_user_snapshot(user.id)
     return user
 
 
 async def delete_user(db: AsyncSession, user: User) -> None:
+    user_id = user.id
     await db.delete(user)
     await db.commit()
-
-
-async def increment_used_bytes(db: AsyncSession, user: User, delta: int) -> None:
-    user.used_bytes = max(0, user.used_bytes + delta)
-    await db.commit()
-    await db.refresh(user)
+    invalidate_user_snapshot(user_id)
+
+
+async def increment_used_bytes(db: AsyncSession, user: User, delta: int, *, commit: bool = True) -> None:
+    # Atomic relative UPDATE: concurrent finalizes cannot lose updates the
+    # way read-modify-write through the ORM attribute could, and RETURNING
+    # replaces the refresh round-trip. With commit=False the UPDATE joins the
+    # caller's transaction so it can share one commit with other changes.
+    stmt = (
+        update(User)
+        .where(User.id == user.id)
+        .values(used_bytes=func.greatest(0, User.used_bytes + delta))
+        .returning(User.used_bytes)
+    )
+    new_value = (await db.execute(stmt)).scalar_one()
+    # set_committed_value keeps the in-memory object in sync without marking
+    # it dirty, which would re-issue the write on commit.
+    set_committed_value(user, "used_bytes", new_value)
+    if commit:
+        await db.commit()
 
 
 async def bulk_update_used_bytes(db: AsyncSession, users: Iterable[User]) -> None:
-    for user in users:
-        user.used_bytes = max(0, user.used_bytes)
+    user_ids = [user.id for user in users]
+    if not user_ids:
+        return
+    await db.execute(
+        update(User).where(User.id.in_(user_ids)).values(used_bytes=func.greatest(0, User.used_bytes))
+    )
     await db.commit()
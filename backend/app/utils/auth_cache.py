@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import hashlib
+import time
+import uuid
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict
+
+from app.utils.security import decode_access_token
+
+if TYPE_CHECKING:  # pragma: no cover - for type checkers only
+    from app.models.user import User
+
+_MAX_ENTRIES = 10_000
+
+# sha256(raw token) -> (decoded payload, unix expiry taken from the JWT "exp" claim)
+_payload_cache: dict[bytes, tuple[Dict[str, Any], float]] = {}
+
+
+def cached_decode_access_token(token: str) -> Dict[str, Any]:
+    """Decode a bearer token, reusing the verified payload until its ``exp``.
+
+    Clients typically present the same bearer token for hours; verifying the
+    HMAC and parsing the JSON payload on every request is wasted work. The
+    decoded payload is cached keyed by the SHA-256 of the raw token, with the
+    entry's lifetime bounded by the token's own ``exp`` claim so an expired
+    token is never served from cache. Only successful decodes are cached, so
+    invalid tokens always go through full verification.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+    entry = _payload_cache.get(key)
+    if entry is not None:
+        payload, expires_at = entry
+        if now < expires_at:
+            return payload
+        _payload_cache.pop(key, None)
+
+    payload = decode_access_token(token)
+    expires_at = payload.get("exp")
+    if isinstance(expires_at, (int, float)) and now < expires_at:
+        if len(_payload_cache) >= _MAX_ENTRIES:
+            _payload_cache.clear()
+        _payload_cache[key] = (payload, float(expires_at))
+    return payload
+
+
+@dataclass(frozen=True)
+class UserAuthSnapshot:
+    """The few user fields the hot auth path actually consults."""
+
+    id: uuid.UUID
+    is_active: bool
+    is_admin: bool
+
+
+_USER_SNAPSHOT_TTL = 30.0
+
+# user id -> (snapshot, monotonic expiry)
+_user_cache: dict[uuid.UUID, tuple[UserAuthSnapshot, float]] = {}
+
+
+def get_cached_user_snapshot(user_id: uuid.UUID) -> UserAuthSnapshot | None:
+    entry = _user_cache.get(user_id)
+    if entry is None:
+        return None
+    snapshot, expires_at = entry
+    if time.monotonic() >= expires_at:
+        _user_cache.pop(user_id, None)
+        return None
+    return snapshot
+
+
+def store_user_snapshot(snapshot: UserAuthSnapshot) -> UserAuthSnapshot:
+    if len(_user_cache) >= _MAX_ENTRIES:
+        _user_cache.clear()
+    _user_cache[snapshot.id] = (snapshot, time.monotonic() + _USER_SNAPSHOT_TTL)
+    return snapshot
+
+
+def cache_user_snapshot(user: "User") -> UserAuthSnapshot:
+    return store_user_snapshot(UserAuthSnapshot(id=user.id, is_active=user.is_active, is_admin=user.is_admin))
+
+
+def invalidate_user_snapshot(user_id: uuid.UUID) -> None:
+    _user_cache.pop(user_id, None)
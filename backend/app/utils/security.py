@@ -1,35 +1,116 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
 import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict
 
 import jwt
+import orjson
 from passlib.context import CryptContext
 
 from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# One preconfigured PyJWT instance per process: avoids rebuilding the options
+# dict per decode and skips claim verifiers (aud/iss) this service never sets.
+_jwt = jwt.PyJWT(
+    options={
+        "verify_signature": True,
+        "verify_exp": True,
+        "verify_aud": False,
+        "verify_iss": False,
+        "require": ["exp"],
+    }
+)
+_jwt_secret_bytes = settings.jwt_secret.encode()
+_jwt_algorithms = [settings.jwt_algorithm]
+
+# HS256 signing fast path: the header never changes and the keyed HMAC state
+# can be prepared once and copied per token, so issuance is orjson + one
+# HMAC update instead of PyJWT's per-call dict merging and json.dumps.
+_HS256_HEADER_B64 = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+_HS256_HMAC_TEMPLATE = hmac.new(_jwt_secret_bytes, digestmod=hashlib.sha256)
+
+
+def _b64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _sign_token(payload: Dict[str, Any]) -> str:
+    if settings.jwt_algorithm != "HS256":
+        return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
+    signing_input = _HS256_HEADER_B64 + b"." + _b64url(orjson.dumps(payload))
+    mac = _HS256_HMAC_TEMPLATE.copy()
+    mac.update(signing_input)
+    return (signing_input + b"." + _b64url(mac.digest())).decode()
+
+
+# bcrypt verification/hashing costs tens of milliseconds of pure CPU; a
+# dedicated pool keeps it off the event loop without starving the default
+# executor used elsewhere.
+_pw_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="pwhash")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# Successful verifications are remembered briefly so a client re-presenting
+# the same password (password-protected link fetched repeatedly, login burst)
+# does not pay the full bcrypt cost each time. Keyed by the SHA-256 of the
+# plaintext plus the stored hash — never the plaintext itself — and only
+# positive results are cached, so wrong passwords always hit bcrypt.
+_VERIFY_CACHE_TTL = 300.0
+_VERIFY_CACHE_MAX = 1024
+_verify_cache: dict[tuple[bytes, str], float] = {}
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Run bcrypt verification in the password executor instead of the event loop."""
+    key = (hashlib.sha256(plain_password.encode()).digest(), hashed_password)
+    now = time.monotonic()
+    expires_at = _verify_cache.get(key)
+    if expires_at is not None:
+        if now < expires_at:
+            return True
+        _verify_cache.pop(key, None)
+
+    loop = asyncio.get_running_loop()
+    verified = await loop.run_in_executor(_pw_executor, pwd_context.verify, plain_password, hashed_password)
+    if verified:
+        if len(_verify_cache) >= _VERIFY_CACHE_MAX:
+            _verify_cache.clear()
+        _verify_cache[key] = now + _VERIFY_CACHE_TTL
+    return verified
+
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def get_password_hash_async(password: str) -> str:
+    """Run bcrypt hashing in the password executor instead of the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pw_executor, pwd_context.hash, password)
+
+
 def create_access_token(subject: str, expires_delta: timedelta | None = None) -> tuple[str, datetime]:
     now = datetime.now(timezone.utc)
     expire = now + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
     payload: Dict[str, Any] = {"sub": subject, "iat": int(now.timestamp()), "exp": int(expire.timestamp())}
-    token = jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
-    return token, expire
+    return _sign_token(payload), expire
 
 
 def decode_access_token(token: str) -> Dict[str, Any]:
-    return jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+    return _jwt.decode(token, _jwt_secret_bytes, algorithms=_jwt_algorithms)
 
 
 def create_download_token(
@@ -47,8 +128,8 @@ def create_download_token(
         "nbf": int(now.timestamp()),
         "exp": int(expires_at.timestamp()),
     }
-    return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
+    return _sign_token(payload)
 
 
 def decode_download_token(token: str) -> Dict[str, Any]:
-    return jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+    return _jwt.decode(token, _jwt_secret_bytes, algorithms=_jwt_algorithms)
@@ -1,16 +1,20 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
+import threading
 import uuid
 from datetime import datetime, timezone
 from pathlib import Path
 
 from celery import Celery
-from sqlalchemy import select
+from celery.signals import worker_process_init
+from kombu import serialization
+from sqlalchemy import func, select
 
 from app.core.config import settings
-from app.db.session import async_session_factory
+from app.db.session import async_session_factory, engine
 from app.models.upload import FileStatus, StoredFile, UploadChunk, UploadSession, UploadStatus
 from app.models.user import User
 from app.services.storage import storage_service
@@ -18,45 +22,113 @@ from app.services.users import increment_used_bytes
 
 logger = logging.getLogger(__name__)
 
+def _uuid_default(value: object) -> dict[str, str]:
+    if isinstance(value, uuid.UUID):
+        return {"__uuid__": str(value)}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _uuid_object_hook(obj: dict) -> object:
+    if "__uuid__" in obj:
+        return uuid.UUID(obj["__uuid__"])
+    return obj
+
+
+# JSON dialect that round-trips uuid.UUID, so task arguments stay UUIDs
+# end-to-end instead of being stringified by the caller and re-parsed in
+# every task invocation.
+serialization.register(
+    "uuidjson",
+    lambda obj: json.dumps(obj, default=_uuid_default),
+    lambda data: json.loads(data, object_hook=_uuid_object_hook),
+    content_type="application/x-uuidjson",
+    content_encoding="utf-8",
+)
+
 celery_app = Celery(
     "share_storage",
     broker=settings.celery_broker,
     backend=settings.celery_backend,
 )
-celery_app.conf.update(task_serializer="json", result_serializer="json", accept_content=["json"])
+celery_app.conf.update(
+    task_serializer="uuidjson",
+    result_serializer="uuidjson",
+    accept_content=["uuidjson", "json"],
+)
+
+
+@worker_process_init.connect
+def _reset_db_pool(**_kwargs: object) -> None:
+    """Drop pool state inherited across the prefork fork.
+
+    Connections opened in the parent (e.g. by module import side effects)
+    must not be shared by children; disposing with ``close=False`` simply
+    forgets them so each worker process builds its own pool, sized by the
+    same settings-driven pool_size as the API. The child then keeps those
+    connections warm across tasks via the persistent event loop."""
+    engine.sync_engine.dispose(close=False)
 
 
 async def _finalize_upload(session_id: uuid.UUID, file_id: uuid.UUID) -> None:
     async with async_session_factory() as db:
-        session: UploadSession | None = await db.get(UploadSession, session_id)
-        if session is None:
-            logger.error("Upload session %s not found", session_id)
+        # One round-trip for the session, its file record and the owner
+        # instead of three sequential db.get calls.
+        # Locking the session row serializes racing deliveries of the same
+        # task: the loser blocks here and then sees COMPLETED below.
+        stmt = (
+            select(UploadSession, StoredFile, User)
+            .select_from(UploadSession)
+            .join(StoredFile, StoredFile.session_id == UploadSession.id)
+            .join(User, User.id == UploadSession.owner_id)
+            .where(UploadSession.id == session_id, StoredFile.id == file_id)
+            .with_for_update(of=UploadSession)
+        )
+        row = (await db.execute(stmt)).one_or_none()
+        if row is None:
+            logger.error("Session %s, file %s or owner not found for finalize", session_id, file_id)
             return
-        stored_file: StoredFile | None = await db.get(StoredFile, file_id)
-        if stored_file is None:
-            logger.error("Stored file %s not found", file_id)
-            return
-        owner: User | None = await db.get(User, session.owner_id)
-        if owner is None:
-            logger.error("Owner %s not found for session %s", session.owner_id, session_id)
+        session, stored_file, owner = row
+
+        # Celery redeliveries must not re-merge, re-hash or double-count
+        # quota; a finished session is simply acknowledged.
+        if session.status == UploadStatus.COMPLETED and stored_file.status == FileStatus.READY:
+            logger.info("Session %s already finalized; skipping", session_id)
             return
 
-        chunk_indexes_stmt = select(UploadChunk.index).where(UploadChunk.session_id == session_id)
-        result = await db.execute(chunk_indexes_stmt)
-        received = sorted(idx for (idx,) in result)
-        if len(received) != session.total_chunks or received != list(range(session.total_chunks)):
+        # Indexes are unique per session and range-checked on upload, so the
+        # completeness check reduces to two scalar aggregates — no index list
+        # crosses the wire.
+        chunk_stats_stmt = select(
+            func.count(UploadChunk.index),
+            func.max(UploadChunk.index),
+            func.coalesce(func.sum(UploadChunk.size), 0),
+        ).where(UploadChunk.session_id == session_id)
+        chunk_count, max_index, predicted_size = (await db.execute(chunk_stats_stmt)).one()
+        if chunk_count != session.total_chunks or max_index != session.total_chunks - 1:
             logger.error("Missing chunks for session %s", session_id)
             session.status = UploadStatus.FAILED
             stored_file.status = FileStatus.ERROR
             await db.commit()
             return
 
+        # The summed chunk sizes equal the merged size exactly, so the quota
+        # can be enforced before spending the merge-and-hash I/O on a file
+        # that would be rejected anyway.
+        if owner.quota_bytes is not None and owner.used_bytes + predicted_size > owner.quota_bytes:
+            logger.error("Quota exceeded for user %s while finalizing file %s", owner.id, file_id)
+            stored_file.status = FileStatus.ERROR
+            session.status = UploadStatus.FAILED
+            await db.commit()
+            await storage_service.cleanup_session(str(session_id))
+            return
+
         target_path = Path(stored_file.storage_path)
         target_path.parent.mkdir(parents=True, exist_ok=True)
-        merged_size = await storage_service.merge_chunks(str(session_id), session.total_chunks, target_path)
+        merged_size, sha256 = await storage_service.merge_and_hash(
+            str(session_id), session.total_chunks, target_path
+        )
 
-        sha256 = await storage_service.compute_sha256(target_path)
-        if sha256 != session.file_sha256:
+        if sha256 != session.file_sha256.lower():
             logger.error(
                 "Hash mismatch for session %s expected=%s actual=%s",
                 session_id,
@@ -68,26 +140,42 @@ async def _finalize_upload(session_id: uuid.UUID, file_id: uuid.UUID) -> None:
             await db.commit()
             return
 
-        if owner.quota_bytes is not None and owner.used_bytes + merged_size > owner.quota_bytes:
-            logger.error("Quota exceeded for user %s while finalizing file %s", owner.id, file_id)
-            stored_file.status = FileStatus.ERROR
-            session.status = UploadStatus.FAILED
-            await db.commit()
-            await storage_service.cleanup_session(str(session_id))
-            return
-
+        # One clock read: completed_at and finalized_at come out identical,
+        # which downstream reconciliation can rely on.
+        now = datetime.now(timezone.utc)
         stored_file.status = FileStatus.READY
-        stored_file.completed_at = datetime.now(timezone.utc)
+        stored_file.completed_at = now
         stored_file.size = merged_size
         session.status = UploadStatus.COMPLETED
-        session.finalized_at = datetime.now(timezone.utc)
+        session.finalized_at = now
+        # Quota accounting joins the same transaction: one commit (and one
+        # WAL flush) covers the status flips and the used_bytes update.
+        await increment_used_bytes(db, owner, merged_size, commit=False)
         await db.commit()
 
-        await increment_used_bytes(db, owner, merged_size)
-
         await storage_service.cleanup_session(str(session_id))
 
 
+# One long-lived event loop per worker process: asyncio.run would build and
+# tear down a loop (and the async engine's per-loop pool state) on every
+# task, so connections could never be reused across finalizes. The loop is
+# created lazily on first use, which also keeps it safely on the child side
+# of a prefork fork.
+_task_loop: asyncio.AbstractEventLoop | None = None
+_task_loop_lock = threading.Lock()
+
+
+def _get_task_loop() -> asyncio.AbstractEventLoop:
+    global _task_loop
+    with _task_loop_lock:
+        if _task_loop is None or _task_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="worker-loop", daemon=True).start()
+            _task_loop = loop
+    return _task_loop
+
+
 @celery_app.task(name="finalize_upload")
-def finalize_upload_task(session_id: str, file_id: str) -> None:
-    asyncio.run(_finalize_upload(uuid.UUID(session_id), uuid.UUID(file_id)))
+def finalize_upload_task(session_id: uuid.UUID, file_id: uuid.UUID) -> None:
+    coro = _finalize_upload(session_id, file_id)
+    asyncio.run_coroutine_threadsafe(coro, _get_task_loop()).result()
@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import os
+
 from app.worker import celery_app
 
 
 def main() -> None:
-    celery_app.worker_main(argv=["worker", "--loglevel=info", "-P", "solo"])
+    # Finalize tasks mix DB awaits, disk I/O and full-file hashing; prefork
+    # lets them run in parallel. Set CELERY_POOL=solo for local debugging.
+    pool = os.environ.get("CELERY_POOL", "prefork")
+    concurrency = int(os.environ.get("CELERY_CONCURRENCY", os.cpu_count() or 2))
+    celery_app.worker_main(
+        argv=["worker", "--loglevel=info", "-P", pool, "--concurrency", str(concurrency)]
+    )
 
 
 if __name__ == "__main__":